@@ -1,6 +1,10 @@
 import json
 from hashlib import sha256
 
+import msgpack
+
+from transactions import Transaction
+
 class block_header:
     def __init__(self, index=0, timestamp=0.0, prev_hash="0", difficulty=0, merkle_root=0, nonce=0):
         self.index = index
@@ -29,3 +33,25 @@ class Block():
 
         self.hash = self.header.calculate_block_hash()
         self.data = data.copy()       ###Transaction[ ]
+        self._serialized_cache = None     ###bytes of serialize_bin(), a block does not change once it is on the chain
+
+    def serialize(self):
+        return {'header': self.header.__dict__,
+                'hash': self.hash,
+                'data': [Tx.serialize() for Tx in self.data]}
+
+    @classmethod
+    def deserialize(cls, data):
+        txs = [Transaction.deserialize(Tx) for Tx in data.get('data', [])]
+        blk = cls(data=txs, **data['header'])
+        blk.hash = data['hash']     ###keep the given hash, a validator recomputes and compares it
+        return blk
+
+    def serialize_bin(self):
+        if self._serialized_cache is None:
+            self._serialized_cache = msgpack.packb(self.serialize(), use_bin_type=True)
+        return self._serialized_cache
+
+    @classmethod
+    def deserialize_bin(cls, data):
+        return cls.deserialize(msgpack.unpackb(data, raw=False))
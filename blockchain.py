@@ -1,5 +1,9 @@
+import os
 import time
 import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from queue import Queue
 
 from block import Block
@@ -7,9 +11,47 @@ from transactions import tx_output, tx_input, Transaction, NId, Npk, calculate_p
 
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
+### payer recorded for coinbase money, the same for every node so hash it once at import
+NONE_ADDRESS = hashlib.sha256("NoneAddress".encode()).hexdigest()
+
+
+def search_nonce(block_header, target, start, end):
+    """
+    Return the first nonce in [start, end) whose hash is below target, -1 if there is none
+    """
+    # the header prefix is the same for every nonce, hash it once and copy the midstate
+    prefix = hashlib.sha256(block_header.encode())
+    sha256, from_bytes = hashlib.sha256, int.from_bytes     ###locals, no attribute lookup per nonce
+    for nonce in range(start, end):
+        inner = prefix.copy()
+        inner.update(str(nonce).encode())
+        hash_result = sha256(inner.hexdigest().encode()).digest()
+        if from_bytes(hash_result, 'big') < target:     ###compare the raw digest, no hex encode + parse
+            return nonce
+    return -1
+
+
+def parallel_search_nonce(block_header, target, max_nonce, chunk, workers):
+    """
+    search_nonce() over [0, max_nonce) split into chunks raced by worker processes
+    """
+    # one chunk per worker per round, map() keeps chunk order so the smallest nonce wins like the serial loop
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for round_start in range(0, max_nonce, chunk * workers):
+            starts = range(round_start, min(round_start + chunk * workers, max_nonce), chunk)
+            ends = [min(start + chunk, max_nonce) for start in starts]
+            for nonce in executor.map(search_nonce, repeat(block_header), repeat(target), starts, ends):
+                if nonce != -1:
+                    return nonce
+    return -1
+
+
 class Blockchain:
     def __init__(self, address = hashlib.sha256((str(np.random.randint(1,1000))).encode()).hexdigest()):
         self.mempool = []
+        self.mempool_Txids = set()     ### Txids in the mempool, O(1) duplicate check
         self.chain = []
         self.node_address = address # str(), representation of a node
         self.public_key , self.private_key = ("","")
@@ -24,8 +66,12 @@ class Blockchain:
         self.DIFFICULTY_ADJUST_BLOCK = 10
         # the average time used for mining a new block(milliseconds)
         self.AVERAGE_MINING_TIME = 3
+        # use all cores from this difficulty on, below it process start-up costs more than the search
+        self.PARALLEL_MINING_BITS = 20
+        # nonces searched by one worker before it reports back
+        self.NONCE_CHUNK = 2 ** 16
 
-        self.NoneAddress = hashlib.sha256("NoneAddress".encode()).hexdigest()
+        self.NoneAddress = NONE_ADDRESS
 
         # 开始时假设所有节点的余额为0，因为要验证储蓄，有些麻烦。UXTO是不保存储蓄的。
             # 除非一次性生成n个coinbase，但一个区块只能保存一个coinbase，要等n个块很浪费
@@ -50,24 +96,17 @@ class Blockchain:
         # 每个节点必须要约定创块时间， 因为每个节点的本地时钟并不相同
 
     def generate_merkle_root(self, input_level):        ###for Transactions
+        sha256 = hashlib.sha256
+
         def build_bottom_level(input_level):
-            bottom_level = []
-            for idx in range(0, len(input_level)):
-                bottom_level.append(hashlib.sha256(input_level[idx].Txid.encode()).hexdigest())  ###string->hash->hash_string
-            return bottom_level  ###str[]
+            return [sha256(Tx.Txid.encode()).hexdigest() for Tx in input_level]  ###string->hash->hash_string, str[]
 
         def build_next_level(prev_level):
-            new_level = []
-            i = 0
-            while i < len(prev_level):
-                if i+1<len(prev_level):
-                    left_hash = prev_level[i]
-                    right_hash = prev_level[i + 1]
-                    new_level.append(hashlib.sha256((left_hash + right_hash).encode()).hexdigest())  ##combine left_hash and right_hash to make new hash
-                else:
-                    only_one_hash = prev_level[i]
-                    new_level.append(only_one_hash)
-                i += 2
+            ##combine left_hash and right_hash to make new hash
+            new_level = [sha256((prev_level[i] + prev_level[i + 1]).encode()).hexdigest()
+                         for i in range(0, len(prev_level) - 1, 2)]
+            if len(prev_level) % 2 == 1:
+                new_level.append(prev_level[-1])     ###an odd last hash goes up unchanged
             return new_level
 
         def end_loop(now_level):
@@ -88,6 +127,7 @@ class Blockchain:
 
     def reload_blockchain(self, Ablockchain):
         self.mempool = Ablockchain.mempool.copy()
+        self.mempool_Txids = {Tx.Txid for Tx in self.mempool}
         self.chain = Ablockchain.chain.copy()
         self.unspentTxOuts=Ablockchain.unspentTxOuts.deepcopy()   ###一定要深度完全拷贝
 
@@ -107,18 +147,21 @@ class Blockchain:
         return self.chain[-index]
 
     def pickup_num_Transaction(self, num):
-        pickup_Transactions=[]      ###Transaction[]
-        for i in range(0,num):
-            if i==len(self.mempool):
-                break
-            pickup_Transactions.append(self.mempool[i])
-        return pickup_Transactions
+        return self.mempool[:num]      ###Transaction[]
+
+    def add_Transaction(self, Tx):
+        # put a Transaction into the mempool, duplicates are rejected
+        if Tx.Txid in self.mempool_Txids:
+            return False
+        self.mempool.append(Tx)
+        self.mempool_Txids.add(Tx.Txid)
+        return True
 
     def del_num_Transcation(self, num):
-        for i in range(0, num):
-            if len(self.mempool)==0:
-                break
-            self.mempool.pop(0)
+        removed = self.mempool[:num]
+        del self.mempool[:num]      ###one slice delete, pop(0) shifted the whole list every time
+        for Tx in removed:
+            self.mempool_Txids.discard(Tx.Txid)
 
     ###————————————————————————————————————————————————————————————————————————————————————————————————————————————————————————————
         ### The following is the mining section, where mine() merges mining. py
@@ -132,14 +175,13 @@ class Blockchain:
         difficulty_bits=last_block.header.difficulty
 
         target = 2 ** (256 - difficulty_bits)
-        proof = -1
 
         # perform the iteration, until finding a nonce which satisfies the target
-        for nonce in range(self.MAX_NONCE):
-            hash_result = hashlib.sha256(hashlib.sha256((str(last_block_header) + str(nonce)).encode()).hexdigest().encode()).hexdigest()
-            if int(hash_result, 16) < target:
-                proof = nonce
-                break
+        workers = os.cpu_count() or 1
+        if difficulty_bits >= self.PARALLEL_MINING_BITS and workers > 1:
+            proof = parallel_search_nonce(last_block_header, target, self.MAX_NONCE, self.NONCE_CHUNK, workers)
+        else:
+            proof = search_nonce(last_block_header, target, 0, self.MAX_NONCE)
         ##mine successfully
         ## proof应该要加密 ？ ？ 做sign？
 
@@ -151,7 +193,7 @@ class Blockchain:
         _Tx=Transaction.create_coinbase_Tx(noneTokenid= NId, vout_index = -1, pub_key=Npk, pub_key_hash=calculate_public_key_hash(self.public_key))     ###coinbase Transaction
 
         pickup_Transcation.append(_Tx)  #node get subsidy 1000
-        print("Txid for coinbase Tx : %s" % (_Tx.Txid))
+        logger.debug("Txid for coinbase Tx : %s", _Tx.Txid)
         ###UTXO也要更新
         if self.node_address not in self.unspentTxOuts.keys():
             tmp_q0=Queue()
@@ -210,7 +252,7 @@ class Blockchain:
     def transfer(self, address_payer, address_receiver, total_value):
 
         if not address_payer in self.unspentTxOuts.keys():
-            print("No such address or it has no amount")
+            logger.warning("No such address or it has no amount: %s", address_payer)
             return False
 
         ##require address_receiver to be an real address
@@ -225,18 +267,19 @@ class Blockchain:
         tmp_value_queue=Queue()
         tmp_Txid_queue=Queue()
         tmp_voutindex_queue=Queue()
-        while sum_value<total_value and (not self.unspentTxOuts[address_payer][0].empty()):
+        payer_utxo=self.unspentTxOuts[address_payer]
+        while sum_value<total_value and (not payer_utxo[0].empty()):
             index = index+1
-            tmp_prepayer=self.unspentTxOuts[address_payer][0].get()
-            tmp_value=self.unspentTxOuts[address_payer][1].get()
-            tmp_Txid=self.unspentTxOuts[address_payer][2].get()
+            tmp_prepayer=payer_utxo[0].get()
+            tmp_value=payer_utxo[1].get()
+            tmp_Txid=payer_utxo[2].get()
 
             tmp_prepayer_queue.put(tmp_prepayer)
             tmp_value_queue.put(tmp_value)
             tmp_Txid_queue.put(tmp_Txid)
             sum_value = sum_value + tmp_value
 
-        print("######")
+        logger.debug("collected %d utxo(s) worth %d from %s", index, sum_value, address_payer)
         if sum_value<total_value:
 
             ###rollback
@@ -245,19 +288,21 @@ class Blockchain:
                 tmp_value=tmp_value_queue.get()
                 tmp_Txid=tmp_Txid_queue.get()
                 tmp_voutindex=tmp_voutindex_queue.get()
-                self.unspentTxOuts[address_payer][0].put(tmp_prepayer)
-                self.unspentTxOuts[address_payer][1].put(tmp_value)
-                self.unspentTxOuts[address_payer][2].put(tmp_Txid)
+                payer_utxo[0].put(tmp_prepayer)
+                payer_utxo[1].put(tmp_value)
+                payer_utxo[2].put(tmp_Txid)
 
             return False
         else :
             ### create Transaction
             vins=[]
             vouts=[]
+            spent=[]        ###collected utxos, given back if the Transaction is rejected
             while not tmp_prepayer_queue.empty():
                 tmp_prepayer=tmp_prepayer_queue.get()
                 tmp_value=tmp_value_queue.get()
                 tmp_Txid=tmp_Txid_queue.get()
+                spent.append((tmp_prepayer, tmp_value, tmp_Txid))
                 vins.append(tx_input(tmp_Txid, -1, address_payer))  ### should implement pub_key later : pub_key = addressOne.signature
                 vouts.append(tx_output(tmp_value, calculate_public_key_hash(address_receiver)))  ### should implement pub_key_hash later
 
@@ -270,13 +315,19 @@ class Blockchain:
 
             ###生成新的Transaction
             new_Transaction=Transaction(vins, vouts)
+            if not self.add_Transaction(new_Transaction):        ###put Transaction into the mempool
+                ###rejected as a duplicate, roll back before any UTXO is credited
+                for tmp_prepayer, tmp_value, tmp_Txid in spent:
+                    payer_utxo[0].put(tmp_prepayer)
+                    payer_utxo[1].put(tmp_value)
+                    payer_utxo[2].put(tmp_Txid)
+                return False
 
             ###UTXO也要更新
             key=address_receiver      ## 修改 receiver的Transactions记录
             self.unspentTxOuts[key][0].put(address_payer)       ###money from
             self.unspentTxOuts[key][1].put(total_value)
             self.unspentTxOuts[key][2].put(new_Transaction.Txid)
-            self.mempool.append(new_Transaction)        ###put Transaction into the mempool
 
             ###是否有残余的，单独更新payer的Transactions记录
             if sum_value > total_value:
@@ -0,0 +1,71 @@
+from ecdsa import SigningKey, SECP256k1
+
+from block import Block
+from blockchain import Blockchain, search_nonce, parallel_search_nonce
+from transactions import tx_input, tx_output, Transaction
+
+
+def make_signable_Tx():
+    sk = SigningKey.generate(curve=SECP256k1)
+    Tx = Transaction([tx_input('aa', 0, 'A'), tx_input('bb', 1, 'A')], [tx_output(5, 'B'), tx_output(3, 'A')])
+    Tx.sk, Tx.vk = sk, sk.get_verifying_key()
+    return Tx
+
+
+def test_raw_size_follows_signed_bytes():
+    Tx = make_signable_Tx()
+    unsigned = Tx.serialize_bin()
+    assert Tx.calculate_raw_size() == len(unsigned)
+
+    Tx.sign()
+    assert Tx.serialize_bin() != unsigned
+    assert Tx.calculate_raw_size() == len(Tx.serialize_bin())
+    assert Tx.verify()
+
+
+def test_verify_rejects_tampering_after_sign():
+    Tx = make_signable_Tx()
+    Tx.sign()
+    assert Tx.verify()
+
+    Tx.vouts[0].value = 500
+    assert not Tx.verify()
+
+
+def test_block_deserialize_keeps_given_hash():
+    bc = Blockchain('A')
+    bc.mine()
+    blk = bc.last_block()
+    blk.header.difficulty = 5       ### changed after hashing, like mine() does on difficulty adjustment
+
+    decoded = Block.deserialize_bin(blk.serialize_bin())
+    assert decoded.hash == blk.hash
+    assert decoded.header.__dict__ == blk.header.__dict__
+    assert [Tx.Txid for Tx in decoded.data] == [Tx.Txid for Tx in blk.data]
+
+
+def test_transfer_rejected_duplicate_credits_nothing(monkeypatch):
+    bc = Blockchain('A')
+    bc.mine()
+    payer_before = list(bc.unspentTxOuts['A'][1].queue)
+
+    monkeypatch.setattr(bc, 'add_Transaction', lambda Tx: False)     ### mempool says duplicate
+    assert not bc.transfer('A', 'B', 300)
+
+    assert bc.mempool == []
+    assert list(bc.unspentTxOuts['A'][1].queue) == payer_before
+    assert bc.unspentTxOuts['B'][1].empty()
+
+
+def test_parallel_search_nonce_matches_serial():
+    header = str(Blockchain('A').last_block().header.__dict__)
+    for difficulty_bits in (4, 8, 12):
+        target = 2 ** (256 - difficulty_bits)
+        nonce = search_nonce(header, target, 0, 2 ** 32)
+        assert nonce != -1
+        assert parallel_search_nonce(header, target, 2 ** 32, 2 ** 9, 2) == nonce
+
+    ### no nonce below max_nonce, with a last chunk shorter than the others
+    target = 2 ** (256 - 24)
+    assert search_nonce(header, target, 0, 1000) == -1
+    assert parallel_search_nonce(header, target, 1000, 300, 2) == -1
@@ -1,30 +1,45 @@
 # coding:utf-8
 import binascii
+import functools
 import hashlib
+import logging
 import time
 
 import ecdsa
+import msgpack
 from ecdsa import SigningKey, NIST384p, VerifyingKey
 # import db
+logger = logging.getLogger(__name__)
+
 subsidy = 1000  # reward for mining one block
 
 
+@functools.lru_cache(maxsize=4096)
+def _get_vk(vk_string):
+    ### parse (and point-validate) each public key only once, payers sign many vins
+    return VerifyingKey.from_string(vk_string, ecdsa.SECP256k1)
+
+
 class tx_output:
+    __slots__ = ('value', 'pub_key_hash')   ###no per-object __dict__
+
     def __init__(self, value, pub_key_hash=''):
         self.value = value   ## money / amount / token
         self.pub_key_hash = pub_key_hash
 
     ### 序列化
     def serialize(self):
-        return self.__dict__
+        return {'value': self.value, 'pub_key_hash': self.pub_key_hash}
 
-    # @classmethod
-    # def deserialize(cls, data):
-    #     value = data.get('value', 0)
-    #     pub_key_hash = data.get('pub_key_hash', 0)
-    #     return cls(value, pub_key_hash)
+    @classmethod
+    def deserialize(cls, data):
+        value = data.get('value', 0)
+        pub_key_hash = data.get('pub_key_hash', 0)
+        return cls(value, pub_key_hash)
 
 class tx_input:
+    __slots__ = ('txid', 'vout', 'pubkey', 'signature')
+
     def __init__(self, txid, vout_index, pub_key):
         self.txid=txid
         self.vout = vout_index
@@ -32,20 +47,32 @@ class tx_input:
         self.signature = ''
 
     def serialize(self):
-        return self.__dict__
+        return {'txid': self.txid, 'vout': self.vout, 'pubkey': self.pubkey, 'signature': self.signature}
+
+    @classmethod
+    def deserialize(cls, data):
+        vin = cls(data.get('txid', ''), data.get('vout', -1), data.get('pubkey', ''))
+        vin.signature = data.get('signature', '')
+        return vin
 
 class Transaction:
     ### tx是一条资金流， Tx == txs是一次完整的P2P交易，收集payer的所有Transaction信息，汇总给receiver
-    def __init__(self, vins, vouts):    ##array of class tx_input, tx_output
+    def __init__(self, vins, vouts, _skip_txid=False):    ##array of class tx_input, tx_output
         self.vins=vins
         self.vouts=vouts
-        self.Txid= self.generate_Txid()   ##txid is str() make by hashlib.sha256
-        self.sum_value=0
-        for idx in range(len(vins)):
-            self.sum_value = self.sum_value + vouts[idx].value
+        self._cached_bin = None         ###filled by serialize_bin()
+        self._cached_sig_msg = None     ###filled by get_signature_message()
+        ### _skip_txid: the caller sets or never reads Txid, don't hash for nothing
+        self.Txid= '' if _skip_txid else self.generate_Txid()   ##txid is str() make by hashlib.sha256
+        self.sum_value = sum(vout.value for vout in vouts)
 
     def generate_Txid(self):            ##derive the drawback
         # generate unique id for a tx (Input is a Transaction)
+        hash = self.content_hash()
+        ###also include random_number in persistence of the same Txid for content all the same
+        return hashlib.sha256((hash+str(time.time())).encode()).hexdigest()
+
+    def content_hash(self):
         ## serialize: class parameters ==>dict.  str: dict==>string
         vin_list= [str(vin.serialize()) for vin in self.vins]
         vouts_list = [str(vout.serialize()) for vout in self.vouts]
@@ -54,9 +81,50 @@ class Transaction:
         concat_list.extend(vouts_list)  ##str
         concat_list=''.join(concat_list)
 
-        hash = hashlib.sha256(concat_list.encode()).hexdigest()  ###whatever hash function to do Txid
-        ###also include random_number in persistence of the same Txid for content all the same
-        return hashlib.sha256((hash+str(time.time())).encode()).hexdigest()
+        return hashlib.sha256(concat_list.encode()).hexdigest()  ###whatever hash function to do Txid
+
+    def serialize(self):
+        return {'Txid': self.Txid,
+                'vins': [vin.serialize() for vin in self.vins],
+                'vouts': [vout.serialize() for vout in self.vouts]}
+
+    @classmethod
+    def deserialize(cls, data):
+        vins = [tx_input.deserialize(vin) for vin in data.get('vins', [])]
+        vouts = [tx_output.deserialize(vout) for vout in data.get('vouts', [])]
+        return cls._from_parts(vins, vouts, data['Txid'])     ###keep the original Txid, generate_Txid() is time based
+
+    @classmethod
+    def _from_parts(cls, vins, vouts, Txid):
+        ### build a Transaction with a known Txid without running __init__
+        Tx = cls.__new__(cls)
+        Tx.vins = vins
+        Tx.vouts = vouts
+        Tx._cached_bin = None
+        Tx._cached_sig_msg = None
+        Tx.Txid = Txid
+        Tx.sum_value = sum(vout.value for vout in vouts)
+        return Tx
+
+    def serialize_bin(self):
+        ### msgpack keeps pubkey/signature as raw bytes, no hex round trip like json
+        if self._cached_bin is None:
+            self._cached_bin = msgpack.packb(self.serialize(), use_bin_type=True)
+        return self._cached_bin
+
+    @classmethod
+    def deserialize_bin(cls, data):
+        return cls.deserialize(msgpack.unpackb(data, raw=False))
+
+    def calculate_raw_size(self):
+        ### size of the current bytes, grows after sign()
+        return len(self.serialize_bin())
+
+    def get_signature_message(self):
+        ### the message is the same for every vin, compute it once per Transaction (sign() only)
+        if self._cached_sig_msg is None:
+            self._cached_sig_msg = self.Transaction_self_copy_leaveout_signature().content_hash()
+        return self._cached_sig_msg
 
     def is_coinbase(self, _Tx):
         # if the Transcation _Tx only has one tx
@@ -65,7 +133,7 @@ class Transaction:
     @classmethod
     ##使用cls在函数中独自创建一个另一个Tranaction类
     def create_coinbase_Tx(cls, noneTokenid, vout_index=-1, pub_key='', pub_key_hash=''):
-        print("coin_noneaddress : %s" % (noneTokenid))
+        logger.debug("coin_noneaddress : %s", noneTokenid)
         _txinput = tx_input(noneTokenid, vout_index, pub_key)
         # _txinput = tx_input(noneaddresss, address_to, '')
         _txoutput = tx_output(subsidy, pub_key_hash)
@@ -88,24 +156,21 @@ class Transaction:
         for vout in self.vouts:
             new_vouts.append(tx_output(vout.value, vout.pub_key_hash))
 
-        new_Transaction = Transaction(new_vins, new_vouts)
+        new_Transaction = Transaction(new_vins, new_vouts, _skip_txid=True)   ###only used for content_hash()
         return new_Transaction
 
 
     def sign(self):
-        Tx_copy = self.Transaction_self_copy_leaveout_signature()
+        message = self.get_signature_message()
 
-        for in_id, vin in enumerate(Tx_copy.vins):
-            Tx_copy.vins[in_id].signature = None
-            Tx_copy.vins[in_id].pub_key = str(in_id);  #"prev_tx.vouts[vin.vout].pub_key_hash
-            Tx_copy.Txid = Tx_copy.generate_Txid()
-            Tx_copy.vins[in_id].pub_key = None
-            self.vins[in_id].signature = self.sk.sign(Tx_copy.Txid.encode("utf8")); #binascii.hexlify(sign).decode()
+        for vin in self.vins:
+            vin.signature = self.sk.sign(message.encode("utf8")); #binascii.hexlify(sign).decode()
+        self._cached_bin = None     ###signatures change the serialized bytes
 
 
 
     def is_valid(vk_string, message, signature):
-        vk = VerifyingKey.from_string(vk_string, ecdsa.SECP256k1)
+        vk = _get_vk(vk_string)
         try:
             vk.verify(signature, str(message).encode("utf8"))  # utf8
             return True
@@ -113,34 +178,23 @@ class Transaction:
             return False
 
     def verify(self):
+        ### rebuild from the current vins/vouts, a memo from sign() would hide later tampering
+        message = self.Transaction_self_copy_leaveout_signature().content_hash().encode("utf8")
+        vk = self.vk        ###already a VerifyingKey, no to_string()/from_string() round trip per vin
 
-        def is_valid(vk_string, message, signature):
-            vk = VerifyingKey.from_string(vk_string, ecdsa.SECP256k1)
+        for vin in self.vins:
             try:
-                vk.verify(signature, str(message).encode("utf8"))  # utf8
-                return True
+                vk.verify(vin.signature, message)
             except:
                 return False
-
-        Tx_copy = self.Transaction_self_copy_leaveout_signature()
-
-        for in_id, vin in enumerate(self.vins):
-            Tx_copy.vins[in_id].signature = None
-            Tx_copy.vins[in_id].pub_key = str(in_id); #prev_tx.vouts[vin.vout].pub_key_hash
-            Tx_copy.Txid=Tx_copy.generate_Txid()
-            Tx_copy.vins[in_id].pub_key = None
-            if not is_valid(self.vk.to_string(), Tx_copy.Txid, self.vins[in_id].signature):
-                return False
         return True
 
 
 
-NTn = Transaction([], [])     ##None token from
-NId = NTn.Txid
+### coinbase input placeholders, constants instead of a Transaction([], []) hash and an rsa key made on every import
+NId = '0' * 64      ##None token from
+Npk = ''
 
 
 def calculate_public_key_hash(_public_key):
     return _public_key
-
-import rsa
-(Npk, Nsk)= rsa.newkeys(2048)
\ No newline at end of file
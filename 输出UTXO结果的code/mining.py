@@ -23,15 +23,18 @@ def proof_of_work(block_header, difficulty_bits):
 
     target = 2**(256 - difficulty_bits)
 
+    # the header part never changes: encode and hash it once, per nonce only copy that state
+    prefix = hashlib.sha256(str(block_header).encode())
+
     # perform the iteration, until finding a nonce which satisfies the target
     for nonce in range(MAX_NONCE):
-        hash_result = hashlib.sha256(
-            (str(block_header) + str(nonce)).encode()).hexdigest()
-        # hash_res = hashlib.sha256(
-        #     str(hash_res).encode('utf-8')).hexdigest()
-        if int(hash_res, 16) < target:
+        hash_state = prefix.copy()
+        hash_state.update(str(nonce).encode())
+        # second SHA-256 over the hex digest, the same hash as Blockchain.mine()
+        hash_result = hashlib.sha256(hash_state.hexdigest().encode()).digest()
+        if int.from_bytes(hash_result, 'big') < target:
             print(f'success with nonce {nonce}\n')
-            print(f'hash is:\t\t {hash_res}')
+            print(f'hash is:\t\t {hash_result.hex()}')
             return nonce
     # target cannot be satisfied even all nonces are traversed
     print(f'failed after {MAX_NONCE} tries\n')
@@ -39,9 +39,7 @@ class Transaction:
         self.vins=vins
         self.vouts=vouts
         self.Txid= self.generate_Txid()   ##txid is str() make by hashlib.sha256
-        self.sum_value=0
-        for idx in range(len(vins)):
-            self.sum_value = self.sum_value + vouts[idx].value
+        self.sum_value = sum(vout.value for vout in vouts)
 
     def generate_Txid(self):
         # generate unique id for a tx (Input is a Transaction)